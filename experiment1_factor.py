@@ -5,36 +5,100 @@ Saves CSV with measurements for each semiprime.
 """
 
 import csv
+import gc
 import math
+import os
 import random
 import time
 import secrets
+import statistics
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import Tuple, Optional, List
 
+# gmpy2 is optional: GMP-backed integers are much cheaper per mulmod/gcd than
+# Python ints, but the experiment still runs on plain ints without it.
+try:
+    from gmpy2 import mpz, gcd as _gcd, powmod
+except ImportError:
+    mpz = int
+    _gcd = math.gcd
+    powmod = pow
+
+# ---------- Small primes (sieve of Eratosthenes, built once at import) ----------
+def _sieve_primes(limit: int) -> Tuple[int, ...]:
+    """Return all primes <= limit."""
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b"\x00\x00"
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytes(len(range(p * p, limit + 1, p)))
+    return tuple(p for p in range(2, limit + 1) if sieve[p])
+
+_SMALL_PRIMES = _sieve_primes(10000)
+# short prefix used to reject composites before Miller-Rabin; a longer scan
+# costs every prime more than it saves on composites
+_MR_TRIAL_PRIMES = tuple(p for p in _SMALL_PRIMES if p < 200)
+
 # ---------- Utilities: Miller-Rabin primality test ----------
+# (bound, witnesses): testing these bases is deterministic for every n < bound
+_DETERMINISTIC_WITNESSES = [
+    (2047, (2,)),
+    (1373653, (2, 3)),
+    (25326001, (2, 3, 5)),
+    (3215031751, (2, 3, 5, 7)),
+    (2152302898747, (2, 3, 5, 7, 11)),
+    (3474749660383, (2, 3, 5, 7, 11, 13)),
+    (341550071728321, (2, 3, 5, 7, 11, 13, 17)),
+    (3825123056546413051, (2, 3, 5, 7, 11, 13, 17, 19, 23)),
+    (318665857834031151167461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+]
+
+def _deterministic_witnesses(n: int, k: int = 8):
+    """Witness bases for n: a proven-deterministic set if n is small enough, else k random ones."""
+    for bound, witnesses in _DETERMINISTIC_WITNESSES:
+        if n < bound:
+            return witnesses
+    return [secrets.randbelow(n - 3) + 2 for _ in range(k)]  # [2, n-2]
+
+def _small_prime_verdict(n: int) -> Optional[bool]:
+    """Trial division of n >= 2 by _MR_TRIAL_PRIMES: True/False if that settles it, None if Miller-Rabin is needed."""
+    for p in _MR_TRIAL_PRIMES:
+        if p * p > n:
+            return True
+        if n % p == 0:
+            return n == p
+    return None
+
+def _decompose(m: int) -> Tuple[int, int]:
+    """Write m as d * 2^s with d odd; returns (s, d)."""
+    s = (m & -m).bit_length() - 1
+    return s, m >> s
+
 def is_probable_prime(n: int, k: int = 8) -> bool:
-    """Miller-Rabin probabilistic primality test."""
+    """Miller-Rabin primality test (deterministic below ~3.3e24, probabilistic with k rounds above)."""
     if n < 2:
         return False
-    small_primes = [2,3,5,7,11,13,17,19,23,29]
-    for p in small_primes:
-        if n % p == 0:
-            return n == p
-    # write n-1 as d * 2^s
-    s = 0
-    d = n - 1
-    while d % 2 == 0:
-        d //= 2
-        s += 1
-    for _ in range(k):
-        a = secrets.randbelow(n - 3) + 2  # [2, n-2]
-        x = pow(a, d, n)
+    # cheap rejection of multiples of small primes before any powmod
+    verdict = _small_prime_verdict(n)
+    if verdict is not None:
+        return verdict
+    return _miller_rabin(n, k)
+
+def _miller_rabin(n: int, k: int = 8) -> bool:
+    """Miller-Rabin rounds only, for odd n > 41 already cleared of small factors."""
+    n = mpz(n)
+    s, d = _decompose(n - 1)
+    # Python-level squaring is cheaper for word-sized n, powmod for larger ones
+    big = n.bit_length() > 64
+    for a in _deterministic_witnesses(n, k):
+        x = powmod(a, d, n)
         if x == 1 or x == n - 1:
             continue
         composite = True
         for _ in range(s - 1):
-            x = (x * x) % n
+            x = powmod(x, 2, n) if big else x * x % n
             if x == n - 1:
                 composite = False
                 break
@@ -43,100 +107,201 @@ def is_probable_prime(n: int, k: int = 8) -> bool:
     return True
 
 # ---------- Prime generation ----------
-def generate_prime(bits: int) -> int:
-    """Generate a prime of approximately `bits` bits."""
+# product of the odd primes below 1000: one gcd against it rejects every
+# candidate with a small factor without running Miller-Rabin
+_SMALL_PRIMORIAL = mpz(math.prod(p for p in _SMALL_PRIMES if 2 < p < 1000))
+
+def generate_prime(bits: int, rng: Optional[random.Random] = None) -> int:
+    """Generate a prime of approximately `bits` bits (drawing from `rng`, default the `random` module)."""
     if bits < 2:
         raise ValueError("bits must be >= 2")
+    rng = rng or random
+    limit = 1 << bits
     while True:
-        candidate = secrets.randbits(bits) | (1 << (bits - 1)) | 1  # ensure top bit and odd
-        if is_probable_prime(candidate):
-            return candidate
+        candidate = rng.getrandbits(bits) | (1 << (bits - 1)) | 1  # ensure top bit and odd
+        # walk odd numbers upward from the random start until we leave the bit range
+        while candidate < limit:
+            # below 1000 the candidate may itself be one of the sieved primes
+            if candidate < 1000:
+                if is_probable_prime(candidate):
+                    return candidate
+            # survivors of the gcd have no odd factor below 1000, so skip the trial division
+            elif _gcd(candidate, _SMALL_PRIMORIAL) == 1 and _miller_rabin(candidate):
+                return candidate
+            candidate += 2
 
-def generate_semiprime(bits: int) -> Tuple[int,int,int]:
+def generate_semiprime(bits: int, rng: Optional[random.Random] = None) -> Tuple[int,int,int]:
     """Generate semiprime N = p*q with p,q ~ bits/2 bits. Returns (N,p,q)."""
     half = bits // 2
-    p = generate_prime(half)
-    q = generate_prime(bits - half)
+    p = generate_prime(half, rng)
+    q = generate_prime(bits - half, rng)
     # ensure p != q
     while q == p:
-        q = generate_prime(bits - half)
+        q = generate_prime(bits - half, rng)
     return p * q, p, q
 
 # ---------- Pollard's Rho factoring ----------
 def gcd(a: int, b: int) -> int:
-    return math.gcd(a, b)
+    return _gcd(a, b)
+
+def pollards_rho(n: int, max_iter: int = 1000000, block: int = 128,
+                 rng: Optional[random.Random] = None) -> Optional[int]:
+    """Pollard's Rho for a nontrivial factor of n (probabilistic).
 
-def pollards_rho(n: int, max_iter: int = 1000000) -> Optional[int]:
-    """Pollard's Rho for a nontrivial factor of n (probabilistic)."""
+    Uses Brent's cycle detection and multiplies `block` differences together
+    before taking a gcd, so only one gcd is paid per block of steps. The
+    starting point and constant come from `rng` (default the `random` module);
+    they need no cryptographic randomness.
+    """
     if n % 2 == 0:
         return 2
+    rng = rng or random
+    n = mpz(n)
     # random polynomial f(x) = x^2 + c mod n
     for attempt in range(10):
-        x = secrets.randbelow(n - 2) + 2
-        y = x
-        c = secrets.randbelow(n - 1) + 1
+        y = mpz(rng.randrange(2, n))
+        c = mpz(rng.randrange(1, n))
+        r = 1
+        q = mpz(1)
         d = 1
         iters = 0
         while d == 1 and iters < max_iter:
-            x = (x * x + c) % n
-            y = (y * y + c) % n
-            y = (y * y + c) % n
-            d = gcd(abs(x - y), n)
-            iters += 1
-            if d == n:
-                break
+            x = y  # snapshot of the hare at the start of this power of two
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and d == 1:
+                ys = y  # start of this block, used to backtrack on d == n
+                for _ in range(min(block, r - k)):
+                    y = (y * y + c) % n
+                    q = (q * (x - y)) % n
+                d = gcd(q, n)
+                k += block
+            iters += r
+            r <<= 1
+        if d == n:
+            # the block overshot: replay it one gcd per step
+            d = 1
+            while d == 1:
+                ys = (ys * ys + c) % n
+                d = gcd(abs(x - ys), n)
         if 1 < d < n:
-            return d
+            return int(d)
     return None
 
 def trial_division_small(n: int, limit: int = 1000) -> Optional[int]:
     """Try small primes up to `limit` to find a factor quickly."""
-    # simple list of primes up to `limit`
-    for p in range(2, limit + 1):
+    for p in _SMALL_PRIMES:
+        if p > limit:
+            break
         if n % p == 0:
             return p
     return None
 
-def factor_semiprime(n: int) -> Tuple[Optional[int], Optional[int]]:
+def _trial_sqrt(n: int) -> Tuple[Optional[int], Optional[int]]:
+    """Full trial division up to isqrt(n) by the prime table; n must be below 9973**2."""
+    root = math.isqrt(n)
+    for p in _SMALL_PRIMES:
+        if p > root:
+            break
+        if n % p == 0:
+            return p, n // p
+    return None, None
+
+def fermat_factor(n: int, max_steps: int = 64) -> Optional[int]:
+    """Fermat's difference of squares for odd n; only succeeds quickly when the factors are close to sqrt(n)."""
+    a = math.isqrt(n)
+    if a * a < n:
+        a += 1
+    for _ in range(max_steps):
+        b2 = a * a - n
+        b = math.isqrt(b2)
+        if b * b == b2:
+            f = a - b
+            return f if 1 < f < n else None
+        a += 1
+    return None
+
+# timed on generate_semiprime output: _trial_sqrt beat the small-prime ->
+# Fermat -> Pollard's Rho path up to 23 bits and lost from 24 bits on
+TRIAL_SQRT_MAX_BITS = 23
+
+def factor_semiprime(n: int, rng: Optional[random.Random] = None) -> Tuple[Optional[int], Optional[int]]:
     """Attempt to return factors p,q of semiprime n (order not guaranteed)."""
+    if n.bit_length() <= TRIAL_SQRT_MAX_BITS:
+        return _trial_sqrt(n)
     # quick small-prime trial
     small = trial_division_small(n, limit=1000)
     if small:
         return small, n // small
+    # p and q have the same bit length, so they are sometimes close enough for Fermat
+    f = fermat_factor(n)
+    if f is not None:
+        return f, n // f
     # pollard
-    f = pollards_rho(n)
+    f = pollards_rho(n, rng=rng)
     if f is None:
         return None, None
     return f, n // f
 
 # ---------- Experiment driver ----------
-def run_experiment(bit_lengths: List[int], samples_per_size: int = 10, out_csv: str = "factor_results.csv"):
+CSV_BATCH_ROWS = 64
+
+def _factor_one(task: Tuple[int, int, int, Tuple[int, int, int]]) -> Tuple[list, float]:
+    """Factor one pre-generated sample; returns (CSV row, elapsed seconds). Runs in a worker process."""
+    bits, i, seed, (N, p_true, q_true) = task
+    rng = random.Random(seed)
+    # keep garbage collection out of the timed region
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter_ns()
+        f1, f2 = factor_semiprime(N, rng)
+        elapsed = (time.perf_counter_ns() - start) / 1e9
+    finally:
+        gc.enable()
+    success = False
+    if f1 is not None and f2 is not None:
+        # normalize order
+        found = sorted([int(f1), int(f2)])
+        true = sorted([int(p_true), int(q_true)])
+        success = (found == true) or (found == sorted([true[1], true[0]]))
+    return [bits, i, N, p_true, q_true, f1, f2, round(elapsed, 6), success], elapsed
+
+def run_experiment(bit_lengths: List[int], samples_per_size: int = 10, out_csv: str = "factor_results.csv",
+                   workers: Optional[int] = None):
     random_seed = 42
-    random.seed(random_seed)
-    secrets_generator = random_seed  
+    # the seed drives semiprime generation here and each worker's Pollard-rho parameters
+    rng = random.Random(random_seed)
+    # samples are independent: generate them all up front, factor them in parallel
+    tasks = []
+    for bits in bit_lengths:
+        for i in range(samples_per_size):
+            tasks.append((bits, i, random_seed + len(tasks), generate_semiprime(bits, rng)))
     header = ["bit_length", "sample_index", "N", "p_true", "q_true", "factor1", "factor2", "time_s", "success"]
-    with open(out_csv, "w", newline="") as csvfile:
+    with open(out_csv, "w", newline="") as csvfile, \
+            ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
         writer = csv.writer(csvfile)
         writer.writerow(header)
-        for bits in bit_lengths:
-            print(f"\n=== Bit length {bits} ({samples_per_size} samples) ===")
-            for i in range(samples_per_size):
-                # generate semiprime
-                N, p_true, q_true = generate_semiprime(bits)
-                start = time.perf_counter()
-                f1, f2 = factor_semiprime(N)
-                end = time.perf_counter()
-                elapsed = end - start
-                success = False
-                if f1 is not None and f2 is not None:
-                    # normalize order
-                    found = sorted([int(f1), int(f2)])
-                    true = sorted([int(p_true), int(q_true)])
-                    success = (found == true) or (found == sorted([true[1], true[0]]))
-                # write row
-                writer.writerow([bits, i, N, p_true, q_true, f1, f2, round(elapsed, 6), success])
-                csvfile.flush()
-                print(f"bits={bits} idx={i} time={elapsed:.4f}s success={success}")
+        times = []
+        pending = []  # rows are written in batches instead of flushed one by one
+        # map() yields rows in task order, so each bit length's rows stay together
+        for n_done, (row, elapsed) in enumerate(executor.map(_factor_one, tasks, chunksize=4), 1):
+            bits, i, success = row[0], row[1], row[-1]
+            if i == 0:
+                print(f"\n=== Bit length {bits} ({samples_per_size} samples) ===")
+                times = []
+            times.append(elapsed)
+            pending.append(row)
+            if len(pending) >= CSV_BATCH_ROWS or n_done == len(tasks):
+                writer.writerows(pending)
+                pending.clear()
+            print(f"bits={bits} idx={i} time={elapsed:.4f}s success={success}")
+            if i == samples_per_size - 1:
+                # median and median absolute deviation are robust to GC/scheduler outliers
+                med = statistics.median(times)
+                mad = statistics.median(abs(t - med) for t in times)
+                print(f"bits={bits} median={med:.6f}s MAD={mad:.6f}s")
     print(f"\nResults written to {out_csv}")
 
 
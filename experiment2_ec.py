@@ -1,8 +1,24 @@
+import gc
+import multiprocessing
+import os
 import random
 import time
 import csv
+import math
+import numpy as np
 from sympy.ntheory import isprime
 
+# Numba is optional. Without it the kernels below are plain Python functions
+# and EllipticCurve never dispatches to them.
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
 # ----------------------------
 # Toy elliptic curve functions
 # ----------------------------
@@ -12,6 +28,8 @@ class EllipticCurve:
         self.a = a
         self.b = b
         self.p = p  # prime modulus
+        # below 2^31 every product of two reduced residues fits in an int64
+        self.use_jit = HAVE_NUMBA and p.bit_length() <= 31
 
     def is_on_curve(self, P):
         if P is None:
@@ -39,61 +57,525 @@ class EllipticCurve:
         y3 = (m * (x1 - x3) - y1) % self.p
         return (x3, y3)
 
+    # Jacobian coordinates: (X, Y, Z) stands for the affine point (X/Z^2, Y/Z^3),
+    # so adds and doubles need no modular inverse. None is the point at infinity.
+
+    def _to_jacobian(self, P):
+        if P is None:
+            return None
+        return (P[0], P[1], 1)
+
+    def _to_affine(self, J):
+        if J is None:
+            return None
+        X, Y, Z = J
+        zinv = pow(Z, -1, self.p)
+        zinv2 = zinv * zinv % self.p
+        return (X * zinv2 % self.p, Y * zinv2 * zinv % self.p)
+
+    def _neg_jac(self, J):
+        if J is None:
+            return None
+        X, Y, Z = J
+        return (X, -Y % self.p, Z)
+
+    def _dbl_jac(self, J):
+        if J is None:
+            return None
+        X, Y, Z = J
+        p = self.p
+        if Y % p == 0:
+            return None
+        YY = Y * Y % p
+        ZZ = Z * Z % p
+        S = 4 * X * YY % p
+        M = (3 * X * X + self.a * ZZ * ZZ) % p
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YY * YY) % p
+        Z3 = 2 * Y * Z % p
+        return (X3, Y3, Z3)
+
+    def _add_jac(self, J1, J2):
+        if J1 is None: return J2
+        if J2 is None: return J1
+        X1, Y1, Z1 = J1
+        X2, Y2, Z2 = J2
+        p = self.p
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        U1 = X1 * Z2Z2 % p
+        U2 = X2 * Z1Z1 % p
+        S1 = Y1 * Z2 * Z2Z2 % p
+        S2 = Y2 * Z1 * Z1Z1 % p
+        if U1 == U2:
+            if S1 != S2:
+                return None
+            return self._dbl_jac(J1)
+        H = (U2 - U1) % p
+        r = (S2 - S1) % p
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - S1 * HHH) % p
+        Z3 = H * Z1 * Z2 % p
+        return (X3, Y3, Z3)
+
     def scalar_mult(self, k, P):
+        if self.use_jit and P is not None and 0 <= k < 2**63:
+            x, y, inf = _ec_mul(k, P[0], P[1], self.a, self.p)
+            return None if inf else (int(x), int(y))
+
+        # width-W NAF in Jacobian coordinates: the odd multiples P, 3P, ..., (2^(W-1) - 1)P
+        # are precomputed, then about one add per W + 1 bits; one inversion at the end
+        J = self._to_jacobian(P)
+        J2 = self._dbl_jac(J)
+        table = [J]
+        for _ in range((1 << (WNAF_WIDTH - 2)) - 1):
+            table.append(self._add_jac(table[-1], J2))
         R = None
-        while k:
-            if k & 1:
-                R = self.add(R, P)
-            P = self.add(P, P)
-            k >>= 1
-        return R
+        for d in reversed(_wnaf(k, WNAF_WIDTH)):
+            R = self._dbl_jac(R)
+            if d > 0:
+                R = self._add_jac(R, table[d >> 1])
+            elif d < 0:
+                R = self._add_jac(R, self._neg_jac(table[-d >> 1]))
+        return self._to_affine(R)
+
+
+WNAF_WIDTH = 5
+
+
+def _wnaf(k, w):
+    """Width-w NAF digits of k >= 0, least significant first. Nonzero digits are odd, |d| < 2^(w-1)."""
+    digits = []
+    while k:
+        if k & 1:
+            d = k & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+# ----------------------------
+# Square roots mod p
+# ----------------------------
+
+def modsqrt(a, p):
+    """Tonelli-Shanks: some y with y^2 == a (mod p) for an odd prime p, or None if a is a non-residue."""
+    a %= p
+    if a == 0:
+        return 0
+    if pow(a, (p - 1) // 2, p) != 1:
+        return None
+    if p % 4 == 3:
+        return pow(a, (p + 1) // 4, p)
+    # p - 1 = q * 2^s with q odd
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q //= 2
+        s += 1
+    z = 2
+    while pow(z, (p - 1) // 2, p) != p - 1:
+        z += 1
+    m, c, t, r = s, pow(z, q, p), pow(a, q, p), pow(a, (q + 1) // 2, p)
+    while t != 1:
+        # least i with t^(2^i) == 1
+        i, t2 = 0, t
+        while t2 != 1:
+            t2 = t2 * t2 % p
+            i += 1
+        bb = pow(c, 1 << (m - i - 1), p)
+        m, c = i, bb * bb % p
+        t, r = t * c % p, r * bb % p
+    return r
+
+
+# ----------------------------
+# Numba kernels for small p
+# ----------------------------
+# Points are (x, y, inf) int64 triples, where inf marks the point at infinity.
+# Callers must keep p < 2^31 so that no product overflows.
+
+@njit(cache=True)
+def _modpow(base, exp, mod):
+    result = 1
+    base %= mod
+    while exp > 0:
+        if exp & 1:
+            result = result * base % mod
+        base = base * base % mod
+        exp >>= 1
+    return result
+
+
+@njit(cache=True)
+def _ec_add(x1, y1, inf1, x2, y2, inf2, a, p):
+    if inf1:
+        return x2, y2, inf2
+    if inf2:
+        return x1, y1, inf1
+    if x1 == x2 and (y1 + y2) % p == 0:
+        return 0, 0, True
+    # p is prime, so the inverse is a^(p-2) (Fermat)
+    if x1 == x2 and y1 == y2:
+        m = (3 * (x1 * x1 % p) + a) % p * _modpow(2 * y1, p - 2, p) % p
+    else:
+        m = (y2 - y1) % p * _modpow(x2 - x1, p - 2, p) % p
+    x3 = (m * m - x1 - x2) % p
+    y3 = (m * ((x1 - x3) % p) - y1) % p
+    return x3, y3, False
+
+
+@njit(cache=True)
+def _ec_mul(k, x, y, a, p):
+    rx, ry, rinf = 0, 0, True
+    inf = False
+    while k > 0:
+        if k & 1:
+            rx, ry, rinf = _ec_add(rx, ry, rinf, x, y, inf, a, p)
+        x, y, inf = _ec_add(x, y, inf, x, y, inf, a, p)
+        k >>= 1
+    return rx, ry, rinf
+
+
+@njit(cache=True)
+def _ec_rho_step(x, y, inf, ca, cb, px, py, qx, qy, a, p, order):
+    # same partition as _rho_branch()
+    if inf or x % 3 == 0:
+        x, y, inf = _ec_add(x, y, inf, px, py, False, a, p)
+        return x, y, inf, (ca + 1) % order, cb
+    elif x % 3 == 1:
+        x, y, inf = _ec_add(x, y, inf, x, y, inf, a, p)
+        return x, y, inf, 2 * ca % order, 2 * cb % order
+    else:
+        x, y, inf = _ec_add(x, y, inf, qx, qy, False, a, p)
+        return x, y, inf, ca, (cb + 1) % order
+
+
+@njit(cache=True)
+def _ec_rho_walk(px, py, qx, qy, a, p, order, max_iter):
+    """Brent-cycle rho walk. Returns (found, a1, b1, a2, b2) at the first collision."""
+    tx, ty, tinf, ta, tb = px, py, False, 1, 0
+    hx, hy, hinf, ha, hb = _ec_rho_step(tx, ty, tinf, ta, tb, px, py, qx, qy, a, p, order)
+    power = 1
+    lam = 1
+    for _ in range(max_iter):
+        if tinf == hinf and (tinf or (tx == hx and ty == hy)):
+            return True, ta, tb, ha, hb
+        if lam == power:
+            tx, ty, tinf, ta, tb = hx, hy, hinf, ha, hb
+            power *= 2
+            lam = 0
+        hx, hy, hinf, ha, hb = _ec_rho_step(hx, hy, hinf, ha, hb, px, py, qx, qy, a, p, order)
+        lam += 1
+    return False, 0, 0, 0, 0
+
+
+# ----------------------------
+# Montgomery batch inversion
+# ----------------------------
+
+def batch_inverse(values, p):
+    """
+    Invert every value mod p with a single pow() plus 3(n-1) multiplications
+    (Montgomery's trick). All values must be nonzero mod p.
+
+    A single rho walk is sequential, so batching pays off only across
+    independent walks: pollards_rho_ecdlp_walks uses this via _inverse_all.
+    """
+    if not values:
+        return []
+    prefix = []
+    acc = 1
+    for v in values:
+        acc = acc * v % p
+        prefix.append(acc)
+    inv = pow(acc, -1, p)
+    out = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        out[i] = inv * prefix[i - 1] % p
+        inv = inv * values[i] % p
+    out[0] = inv
+    return out
 
 
 # ----------------------------
 # Pollard’s Rho for ECDLP
 # ----------------------------
 
-def pollards_rho_ecdlp(curve, P, Q, order, max_iter=100000):
+def _solve_collision(a, b, a2, b2, order):
+    """k from aP + bQ == a2P + b2Q, or None if the collision gives no information."""
+    r = (a - a2) % order
+    s = (b2 - b) % order
+    if s == 0:
+        return None
+    inv = pow(s, -1, order)
+    return (r * inv) % order
+
+
+def _rho_branch(X, a, b, P, Q, order):
+    """Addend R and updated (a, b) for the rho step X -> X + R."""
+    # the point at infinity goes to P, like the X[0] % 3 == 0 partition
+    if X is None or X[0] % 3 == 0:
+        return P, (a + 1) % order, b
+    elif X[0] % 3 == 1:
+        return X, (2 * a) % order, (2 * b) % order
+    else:
+        return Q, a, (b + 1) % order
+
+
+def pollards_rho_ecdlp(curve, P, Q, order, max_iter=300000):
     """
     Solve Q = kP using Pollard's Rho.
     Returns k or None if not found within max_iter.
+
+    max_iter counts point additions (one per Brent step); the default
+    matches the old Floyd budget of 100000 iterations x 3 adds.
     """
 
-    def f(X, a, b):
-        if X is None:  # handle point at infinity
-            return P, (a + 1) % order, b
+    if curve.use_jit and Q is not None and order.bit_length() <= 62:
+        found, a, b, a2, b2 = _ec_rho_walk(P[0], P[1], Q[0], Q[1],
+                                           curve.a, curve.p, order, max_iter)
+        if not found:
+            return None
+        return _solve_collision(int(a), int(b), int(a2), int(b2), order)
 
-        if X[0] % 3 == 0:
-            return curve.add(X, P), (a + 1) % order, b
-        elif X[0] % 3 == 1:
-            return curve.add(X, X), (2 * a) % order, (2 * b) % order
-        else:
-            return curve.add(X, Q), a, (b + 1) % order
+    def step(X, a, b):
+        R, a, b = _rho_branch(X, a, b, P, Q, order)
+        return curve.add(X, R), a, b
 
-    # Initialize
-    X, a, b = P, 1, 0
-    X2, a2, b2 = X, a, b  # "tortoise and hare"
+    # Initialize: Brent's cycle detection. The tortoise waits at a saved
+    # position while the hare takes `power` steps, then jumps to the hare.
+    tortoise = (P, 1, 0)
+    hare = step(*tortoise)
+    power = lam = 1
 
     for _ in range(max_iter):
-        X, a, b = f(X, a, b)
-        X2, a2, b2 = f(*f(X2, a2, b2))  # hare moves twice as fast
-
+        X, a, b = tortoise
+        X2, a2, b2 = hare
         if X == X2:  # Collision
-            r = (a - a2) % order
-            s = (b2 - b) % order
-            if s == 0:
-                return None
-            inv = pow(s, -1, order)
-            return (r * inv) % order
+            return _solve_collision(a, b, a2, b2, order)
+
+        if lam == power:
+            tortoise = hare
+            power *= 2
+            lam = 0
+        hare = step(*hare)
+        lam += 1
 
     return None
 
 
+# ----------------------------
+# Many-walk Pollard’s Rho (structure of arrays)
+# ----------------------------
+
+def _inverse_all(values, p):
+    """Inverse mod p of every entry of a numpy array of nonzero residues."""
+    if values.dtype == object:
+        return np.array(batch_inverse(list(values), p), dtype=object)
+    # int64 lanes (p < 2^31): vectorized Fermat inversion, values^(p-2)
+    result = np.ones_like(values)
+    base = values % p
+    e = p - 2
+    while e:
+        if e & 1:
+            result = result * base % p
+        base = base * base % p
+        e >>= 1
+    return result
+
+
+def pollards_rho_ecdlp_walks(curve, P, Q, order, walks=512, theta=None, max_steps=100000):
+    """
+    Solve Q = kP with `walks` independent Pollard's Rho walks advanced together.
+
+    Walk state is kept as arrays (x, y, a, b and an infinity flag), so each step
+    applies f to every walk at once with one batch of inversions. A walk only
+    reports points whose x has its low `theta` bits clear (distinguished
+    points) to a shared table; two reports of the same point with different
+    (a, b) give the collision.
+    Returns k or None if not found within max_steps steps.
+
+    numpy's per-call overhead is only amortised over a few hundred lanes:
+    below about 128 walks a step costs more per point than the scalar
+    pollards_rho_ecdlp, and with the default 512 the end-to-end solve only
+    wins once the order is above about 2^20.
+    """
+    if Q is None:
+        return 0  # Q is the point at infinity, so k = 0 (mod the order of P)
+    p = curve.p
+    dtype = np.int64 if p.bit_length() <= 31 else object
+    cdtype = np.int64 if order.bit_length() <= 62 else object
+    if theta is None:
+        # about 32 distinguished points per walk before the expected collision,
+        # but at least 1 in 16 points so the per-lane table updates stay rare
+        theta = max(4, (math.isqrt(order) // (walks * 32)).bit_length() - 1)
+        # in tiny fields no x < p may have 4 low zero bits; keep 2^theta <= p^(1/4)
+        theta = min(theta, (p.bit_length() - 1) // 4)
+    mask = (1 << theta) - 1
+    restart_after = 20 << theta  # a walk this long without a DP is stuck in a cycle
+
+    xs = np.zeros(walks, dtype=dtype)
+    ys = np.zeros(walks, dtype=dtype)
+    inf = np.zeros(walks, dtype=bool)
+    A = np.zeros(walks, dtype=cdtype)
+    B = np.zeros(walks, dtype=cdtype)
+    since_dp = np.zeros(walks, dtype=np.int64)
+
+    def set_lane(i, X, a, b):
+        A[i], B[i], since_dp[i] = a, b, 0
+        if X is None:
+            inf[i] = True
+        else:
+            xs[i], ys[i], inf[i] = X[0], X[1], False
+
+    def restart(i):
+        a, b = random.randrange(order), random.randrange(order)
+        set_lane(i, curve.add(curve.scalar_mult(a, P), curve.scalar_mult(b, Q)), a, b)
+
+    # walk i starts at (a0 + i*c)P + (b0 + i*d)Q: one add per walk instead of
+    # two scalar multiplications
+    a0, b0, c, d = (random.randrange(order) for _ in range(4))
+    X = curve.add(curve.scalar_mult(a0, P), curve.scalar_mult(b0, Q))
+    T = curve.add(curve.scalar_mult(c, P), curve.scalar_mult(d, Q))
+    for i in range(walks):
+        set_lane(i, X, (a0 + i * c) % order, (b0 + i * d) % order)
+        X = curve.add(X, T)
+
+    table = {}
+    for _ in range(max_steps):
+        # partition: 0 -> X + P (also for infinity), 1 -> 2X, 2 -> X + Q
+        part = np.where(inf, 0, xs % 3).astype(np.int64)
+        dbl = part == 1
+        ax = np.where(part == 0, P[0], np.where(part == 2, Q[0], xs))
+        ay = np.where(part == 0, P[1], np.where(part == 2, Q[1], ys))
+
+        # lanes that hit an exceptional case of the addition formula go through curve.add
+        special = inf | (~dbl & (xs == ax)) | (dbl & (ys == 0))
+        normal = ~special
+        special_idx = np.flatnonzero(special)
+        special_pts = [curve.add(None if inf[i] else (int(xs[i]), int(ys[i])),
+                                 (int(ax[i]), int(ay[i])) if not dbl[i] else (int(xs[i]), int(ys[i])))
+                       for i in special_idx]
+
+        x1, y1, x2, y2 = xs[normal], ys[normal], ax[normal], ay[normal]
+        d = dbl[normal]
+        num = np.where(d, (x1 * x1 % p) * 3 + curve.a, y2 - y1) % p
+        den = np.where(d, 2 * y1, x2 - x1) % p
+        m = num * _inverse_all(den, p) % p
+        x3 = (m * m - x1 - x2) % p
+        xs[normal] = x3
+        ys[normal] = (m * ((x1 - x3) % p) - y1) % p
+        for i, X in zip(special_idx, special_pts):
+            if X is None:
+                inf[i] = True
+            else:
+                xs[i], ys[i], inf[i] = X[0], X[1], False
+
+        A = np.where(part == 0, A + 1, np.where(dbl, 2 * A, A)) % order
+        B = np.where(dbl, 2 * B, np.where(part == 2, B + 1, B)) % order
+        since_dp += 1
+
+        dp = np.flatnonzero(~inf & ((xs & mask) == 0))
+        since_dp[dp] = 0
+        for i, x, y, a, b in zip(dp.tolist(), xs[dp].tolist(), ys[dp].tolist(),
+                                 A[dp].tolist(), B[dp].tolist()):
+            prev = table.get((x, y))
+            if prev is None:
+                table[(x, y)] = (a, b)
+                continue
+            k = _solve_collision(a, b, prev[0], prev[1], order)
+            if k is not None:
+                return k
+            # same (a, b) again (a closed cycle, or walks merged with no information): start afresh
+            restart(i)
+        for i in np.flatnonzero(since_dp > restart_after):
+            restart(i)
+
+    return None
+
+
+# ----------------------------
+# Parallel Pollard’s Rho (worker processes, distinguished points)
+# ----------------------------
+
+def _dp_walk_worker(task):
+    """
+    One rho walk in a worker process. Distinguished points go to the shared
+    table; returns k on a useful collision, None once max_iter is reached or
+    another worker has finished.
+    """
+    curve, P, Q, order, theta, seed, worker_id, table, done, max_iter = task
+    rng = random.Random(seed)
+    mask = (1 << theta) - 1
+    restart_after = 20 << theta  # a walk this long without a DP is stuck in a cycle
+
+    def new_walk():
+        a, b = rng.randrange(order), rng.randrange(order)
+        return curve.add(curve.scalar_mult(a, P), curve.scalar_mult(b, Q)), a, b
+
+    X, a, b = new_walk()
+    since_dp = 0
+    for i in range(max_iter):
+        if i % 1024 == 0 and done.is_set():
+            return None
+        R, a, b = _rho_branch(X, a, b, P, Q, order)
+        X = curve.add(X, R)
+        since_dp += 1
+        if X is not None and X[0] & mask == 0:
+            since_dp = 0
+            # setdefault runs in the manager process, so check-and-insert is atomic
+            # (worker_id, i) makes the entry unique, so prev == mine means we inserted it
+            mine = (a, b, worker_id, i)
+            prev = table.setdefault(X, mine)
+            if prev != mine:
+                k = _solve_collision(a, b, prev[0], prev[1], order)
+                if k is not None:
+                    done.set()
+                    return k
+                # same (a, b) again (a closed cycle, or walks merged with no information): start afresh
+                X, a, b = new_walk()
+        elif since_dp > restart_after:
+            X, a, b = new_walk()
+            since_dp = 0
+    return None
+
+
+def pollards_rho_ecdlp_parallel(curve, P, Q, order, workers=None, theta=None, max_iter=1000000):
+    """
+    Solve Q = kP with one Pollard's Rho walk per worker process.
+    Walks share only their distinguished points (x with the low `theta` bits
+    clear) through a Manager dict, so storage is about 1/2^theta of the
+    points visited. Returns k or None if no walk succeeds within max_iter steps.
+    """
+    workers = workers or os.cpu_count()
+    if theta is None:
+        # about 32 distinguished points per walk before the expected collision
+        theta = max(0, (math.isqrt(order) // (workers * 32)).bit_length() - 1)
+    with multiprocessing.Manager() as manager, multiprocessing.Pool(workers) as pool:
+        table = manager.dict()
+        done = manager.Event()
+        tasks = [(curve, P, Q, order, theta, random.getrandbits(64), wid, table, done, max_iter)
+                 for wid in range(workers)]
+        for k in pool.imap_unordered(_dp_walk_worker, tasks):
+            if k is not None:
+                return k
+    return None
+
+
 # ----------------------------
 # Experiment runner
 # ----------------------------
 
-def run_experiment(bit_lengths=[16, 20, 24, 28, 32], samples=5, filename="ecc_results.csv"):
+def run_experiment(bit_lengths=[16, 20, 24, 28, 32], samples=5, filename="ecc_results.csv",
+                   solver=pollards_rho_ecdlp):
     with open(filename, "w", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["bit_length", "sample_index", "p", "a", "b", "P", "Q",
@@ -113,23 +595,31 @@ def run_experiment(bit_lengths=[16, 20, 24, 28, 32], samples=5, filename="ecc_re
             P = None
             for x in range(1, p):
                 y2 = (x * x * x + a * x + b) % p
-                for y in range(p):
-                    if (y * y) % p == y2:
-                        P = (x, y)
-                        break
-                if P: break
+                y = modsqrt(y2, p)
+                if y is not None:
+                    P = (x, y)
+                    break
             if not P:
                 continue  # skip if no point found
 
             order = p  # crude assumption, okay for toy experiments
+            if curve.use_jit:
+                # compile the Numba kernels before anything is timed
+                pollards_rho_ecdlp(curve, P, P, order, max_iter=1)
 
             for i in range(samples):
                 k_true = random.randint(2, p - 1)
                 Q = curve.scalar_mult(k_true, P)
 
-                start = time.time()
-                k_found = pollards_rho_ecdlp(curve, P, Q, order)
-                elapsed = time.time() - start
+                # monotonic ns timer, garbage collection kept out of the timed region
+                gc.collect()
+                gc.disable()
+                try:
+                    start = time.perf_counter_ns()
+                    k_found = solver(curve, P, Q, order)
+                    elapsed = (time.perf_counter_ns() - start) / 1e9
+                finally:
+                    gc.enable()
 
                 success = (k_found == k_true)
                 writer.writerow([bits, i, p, a, b, P, Q,